@@ -2,13 +2,13 @@ import time
 import json
 import os
 import datetime
+import gc
 import sys
 import subprocess  # 新增导入
 from wifi_utils import is_connected, connect_to_wifi
-from plyer import notification
-from PIL import Image
-import pystray
+from footprint import Footprint, format_snapshot, DEFAULT_BUDGET_MB
 from threading import Thread
+# plyer / PIL / pystray 在用到时才导入：只连接一次就退出的模式不需要托盘，通知也很少发送
 
 # ====== 隐藏子进程窗口的函数（仅 Windows）======
 def hide_subprocess_window():
@@ -33,13 +33,19 @@ hide_subprocess_window()
 CONFIG_FILE = "user_settings.json"
 PROFILE_FILE = "wifi_profiles.json"
 NOTIFY_TIMEOUT = 1.3     # 单位：秒
+# 无控制台打包（--noconsole）时 stdout 为 None，日志无处输出，直接跳过时间格式化
+LOG_ENABLED = sys.stdout is not None
 
 def log(msg):
+    if not LOG_ENABLED:
+        return
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{now}] {msg}")
 
 def send_notification(title, message):
     try:
+        from plyer import notification
+
         script_dir = os.path.dirname(os.path.abspath(__file__))
         icon_path = os.path.join(script_dir, "wifi.ico")
         icon = icon_path if os.path.exists(icon_path) else None
@@ -66,42 +72,102 @@ def load_settings():
             return json.load(f)
     return {}
 
-def monitor_network(ssid, password, check_interval=1800):
+class MonitorState:
+    """监护循环的全部状态：启动时分配一次，每次检测只更新字段，日志文本也只格式化一次"""
+    __slots__ = ("ssid", "password", "quiet", "checks", "reconnects", "failures",
+                 "msg_still", "msg_lost", "msg_ok", "msg_fail")
+
+    def __init__(self, ssid, password, quiet=False):
+        self.ssid = ssid
+        self.password = password
+        self.quiet = quiet          # 节能模式：稳定连接时不输出“仍连接”日志
+        self.checks = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.msg_still = f"✅ 当前仍连接到 {ssid}"
+        self.msg_lost = f"⚠️ 当前未连接到 {ssid}，正在尝试重新连接..."
+        self.msg_ok = f"✅ 已成功连接到 {ssid}"
+        self.msg_fail = f"❌ 无法连接到 {ssid}"
+
+def check_once(state, reporter=None, check=is_connected, connect=connect_to_wifi, notify=send_notification):
+    state.checks += 1
+    connected = check(target_ssid=state.ssid)
+    if reporter:
+        reporter.record_check(connected)
+
+    if connected:
+        if not state.quiet:
+            log(state.msg_still)
+        return True
+
+    log(state.msg_lost)
+    state.reconnects += 1
+    success = connect(state.ssid, state.password) and check(target_ssid=state.ssid)
+    if reporter:
+        reporter.record_reconnect(success)
+
+    if success:
+        log(state.msg_ok)
+        notify("网络已恢复", state.msg_ok)
+    else:
+        state.failures += 1
+        log(state.msg_fail)
+        notify("连接失败", state.msg_fail)
+    return success
+
+def monitor_network(ssid, password, check_interval=1800, reporter=None, state=None, footprint=None,
+                    check=is_connected, connect=connect_to_wifi, notify=send_notification, sleep=time.sleep):
+    if state is None:
+        state = MonitorState(ssid, password)
+    if state.quiet:
+        # 启动阶段的对象不再参与垃圾回收扫描，减少常驻期间的 CPU 占用
+        gc.collect()
+        gc.freeze()
+
     while True:
-        if not is_connected(target_ssid=ssid):
-            log(f"⚠️ 当前未连接到 {ssid}，正在尝试重新连接...")
-            success = connect_to_wifi(ssid, password)
+        check_once(state, reporter, check=check, connect=connect, notify=notify)
 
-            if success and is_connected(target_ssid=ssid):
-                msg = f"✅ 已成功连接到 {ssid}"
-                log(msg)
-                send_notification("网络已恢复", msg)
-            else:
-                msg = f"❌ 无法连接到 {ssid}"
-                log(msg)
-                send_notification("连接失败", msg)
-        else:
-            log(f"✅ 当前仍连接到 {ssid}")
+        if footprint and footprint.check_budget():
+            msg = format_snapshot(footprint.snapshot(state))
+            log(f"⚠️ 内存占用超出预算: {msg}")
+            notify("内存占用超出预算", msg)
 
-        time.sleep(check_interval)
+        sleep(check_interval)
 
 # ========== 托盘图标与退出逻辑 ==========
 
-def stop_program(icon, item):
+def stop_program(icon, item, reporter=None):
     log("🛑 用户点击退出，程序即将关闭")
+    if reporter:
+        # 退出前把尚未推送的状态（包括最后一次断网/恢复）发出去
+        reporter.stop()
     icon.stop()
     os._exit(0)  # 强制退出所有线程
 
-def create_tray_icon():
+def show_footprint(state, footprint):
+    msg = format_snapshot(footprint.snapshot(state))
+    log(f"占用情况: {msg}")
+    for line in footprint.top_allocations():
+        log(f"    {line}")
+    send_notification("占用情况", msg)
+
+def build_tray_icon(state=None, footprint=None, reporter=None):
+    from PIL import Image
+    import pystray
+
     icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wifi.ico")
     image = Image.open(icon_path) if os.path.exists(icon_path) else Image.new('RGB', (64, 64), color='blue')
 
-    menu = pystray.Menu(
-        pystray.MenuItem('退出', stop_program)
-    )
+    items = []
+    if footprint is not None:
+        items.append(pystray.MenuItem('占用情况', lambda icon, item: show_footprint(state, footprint)))
+    items.append(pystray.MenuItem('退出', lambda icon, item: stop_program(icon, item, reporter)))
+    menu = pystray.Menu(*items)
+
+    return pystray.Icon("Wi-Fi Monitor", image, "Wi-Fi 自动连接工具", menu)
 
-    tray_icon = pystray.Icon("Wi-Fi Monitor", image, "Wi-Fi 自动连接工具", menu)
-    tray_icon.run()
+def create_tray_icon(state=None, footprint=None, reporter=None):
+    build_tray_icon(state, footprint, reporter).run()
 
 def run_daemon():
     profiles = load_profiles()
@@ -114,11 +180,27 @@ def run_daemon():
         password = profiles[default_ssid]
         log(f"启动对 {default_ssid} 的监护")
 
+        # 节能模式与内存预算（user_settings.json 中的 idle_mode / footprint_budget_mb / footprint_trace）
+        state = MonitorState(default_ssid, password, quiet=settings.get("idle_mode") == "是")
+        footprint = Footprint(
+            budget_mb=settings.get("footprint_budget_mb", DEFAULT_BUDGET_MB),
+            trace=settings.get("footprint_trace") == "是",
+            log=log,
+        )
+
+        # 可选：向集中收集端推送状态（user_settings.json 中配置 fleet_collector）
+        reporter = None
+        if settings.get("fleet_collector"):
+            from fleet_reporter import create_reporter
+            reporter = create_reporter(settings, log=log)
+            log(f"状态将推送到收集端 {reporter.url}")
+            reporter.start()
+
         # 启动托盘图标
-        Thread(target=create_tray_icon, daemon=True).start()
+        Thread(target=create_tray_icon, args=(state, footprint, reporter), daemon=True).start()
 
         # 开始监控网络
-        monitor_network(default_ssid, password)
+        monitor_network(default_ssid, password, reporter=reporter, state=state, footprint=footprint)
 
     else:
         log("监护模式未启用，仅尝试连接一次默认网络")
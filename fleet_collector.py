@@ -0,0 +1,404 @@
+# fleet_collector.py
+# 集中收集各机器守护进程推送的状态，按站点汇总断网时段与重连统计
+#
+# 用法：
+#   python fleet_collector.py serve [--host 0.0.0.0] [--port 8765]
+#   python fleet_collector.py loadtest [--agents 300] [--rounds 48]
+#
+# 接口：
+#   POST /report   接收 fleet_reporter 推送的 zlib 压缩 JSON 批次
+#   GET  /sites    返回各站点汇总（JSON）
+
+import argparse
+import datetime
+import io
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fleet_reporter import FleetReporter, METRIC_KEYS
+
+DEFAULT_PORT = 8765
+OUTAGE_RING_SIZE = 32       # 每台机器保留的最近断网时段数（环形缓冲）
+RECENT_OUTAGES_PER_SITE = 20
+MAX_BODY = 256 * 1024       # 单个请求体上限，单位：字节
+MAX_DECODED_BODY = 1024 * 1024  # 解压后的上限，单位：字节；正常批次只有几 KB，防止压缩炸弹
+
+
+def log(msg):
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {msg}")
+
+
+class AgentState:
+    # 每台机器一个对象，用 __slots__ 控制几百台时的内存占用
+    __slots__ = ("site", "boot", "last_seq", "last_seen", "connected", "down_since",
+                 "outages", "outage_count", "outage_seconds", "totals")
+
+    def __init__(self, site):
+        self.site = site
+        self.boot = None
+        self.last_seq = 0
+        self.last_seen = 0.0
+        self.connected = None
+        self.down_since = None
+        self.outages = deque(maxlen=OUTAGE_RING_SIZE)
+        self.outage_count = 0
+        self.outage_seconds = 0.0
+        self.totals = [0] * len(METRIC_KEYS)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_batch(batch):
+    """
+    校验一个批次的完整结构，返回 (agent_id, site, boot, seq, events, totals)。
+    结构不对时抛出 ValueError，此时尚未改动任何状态。
+    """
+    if not isinstance(batch, dict):
+        raise ValueError("批次必须是 JSON 对象")
+    agent_id = batch.get("agent")
+    site = batch.get("site") or "default"
+    boot = batch.get("boot")
+    seq = batch.get("seq")
+    if not isinstance(agent_id, str) or not agent_id:
+        raise ValueError("agent 无效")
+    if not isinstance(site, str):
+        raise ValueError("site 无效")
+    if boot is not None and not isinstance(boot, str):
+        raise ValueError("boot 无效")
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq <= 0:
+        raise ValueError("seq 无效")
+
+    events = batch.get("events", [])
+    if not isinstance(events, list):
+        raise ValueError("events 必须是列表")
+    for event in events:
+        if (not isinstance(event, list) or len(event) != 2
+                or not _is_number(event[0]) or event[1] not in (0, 1) or isinstance(event[1], float)):
+            raise ValueError("events 中的元素必须是 [时间戳, 0/1]")
+
+    metrics = batch.get("metrics", {})
+    if not isinstance(metrics, dict):
+        raise ValueError("metrics 必须是对象")
+    totals = []
+    for key in METRIC_KEYS:
+        value = metrics.get(key, 0)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"metrics.{key} 必须是非负整数")
+        totals.append(value)
+
+    return agent_id, site, boot, seq, events, totals
+
+
+class FleetStore:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.agents = {}
+        self.duplicates = 0     # 因 (boot, seq) 已处理而忽略的重发批次数
+        self._lock = threading.Lock()
+
+    def ingest(self, batch):
+        """处理一个批次；重复批次返回 False，结构不对时抛出 ValueError 且不改动状态"""
+        agent_id, site, boot, seq, events, totals = parse_batch(batch)
+
+        with self._lock:
+            state = self.agents.get(agent_id)
+            if state is None:
+                state = self.agents[agent_id] = AgentState(site)
+            state.site = site
+            state.last_seen = self.clock()
+
+            if boot != state.boot:
+                # 守护进程重启，seq 从头开始
+                state.boot = boot
+                state.last_seq = 0
+            if seq <= state.last_seq:
+                self.duplicates += 1
+                return False
+            state.last_seq = seq
+
+            for ts, up in events:
+                if up:
+                    if state.connected is False and state.down_since is not None:
+                        duration = max(0.0, ts - state.down_since)
+                        state.outages.append((state.down_since, ts))
+                        state.outage_count += 1
+                        state.outage_seconds += duration
+                    state.connected = True
+                    state.down_since = None
+                elif state.connected is not False:
+                    state.connected = False
+                    state.down_since = ts
+
+            for i, value in enumerate(totals):
+                state.totals[i] += value
+            return True
+
+    def site_summary(self):
+        now = self.clock()
+        sites = {}
+        with self._lock:
+            for agent_id, state in self.agents.items():
+                s = sites.get(state.site)
+                if s is None:
+                    s = sites[state.site] = {
+                        "agents": 0,
+                        "down_now": 0,
+                        "outages": 0,
+                        "outage_seconds": 0.0,
+                        **dict.fromkeys(METRIC_KEYS, 0),
+                        "recent_outages": [],
+                    }
+                s["agents"] += 1
+                s["outages"] += state.outage_count
+                s["outage_seconds"] += state.outage_seconds
+                for key, value in zip(METRIC_KEYS, state.totals):
+                    s[key] += value
+                s["recent_outages"].extend([agent_id, start, end] for start, end in state.outages)
+                if state.connected is False:
+                    s["down_now"] += 1
+                    s["recent_outages"].append([agent_id, state.down_since, None])
+                    s["outage_seconds"] += max(0.0, now - state.down_since)
+
+        for s in sites.values():
+            s["recent_outages"].sort(key=lambda o: o[1], reverse=True)
+            del s["recent_outages"][RECENT_OUTAGES_PER_SITE:]
+            s["outage_seconds"] = round(s["outage_seconds"], 1)
+            s["reconnect_rate"] = round(s["reconnect_ok"] / s["reconnects"], 3) if s["reconnects"] else None
+        return sites
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/report":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY:
+                self.send_error(413 if length > MAX_BODY else 400)
+                return
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Encoding") == "deflate":
+                inflater = zlib.decompressobj()
+                body = inflater.decompress(body, MAX_DECODED_BODY)
+                if inflater.unconsumed_tail:
+                    self.send_error(413)
+                    return
+            self.server.store.ingest(json.loads(body.decode("utf-8")))
+        except (ValueError, KeyError, TypeError, AttributeError, zlib.error) as e:
+            self.send_error(400, explain=str(e))
+            return
+        self.send_response(204)
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path != "/sites":
+            self.send_error(404)
+            return
+        data = json.dumps(self.server.store.site_summary(), ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 几百台机器的请求日志没有意义，只保留错误
+        pass
+
+
+class CollectorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # 默认 5，几百台同时推送时会被拒绝连接
+
+
+def make_server(host, port, store=None, handler=CollectorHandler):
+    server = CollectorServer((host, port), handler)
+    server.store = store or FleetStore()
+    return server
+
+
+# ========== 本机压测：大量模拟机器对 localhost 收集端 ==========
+
+class SimClock:
+    def __init__(self, t):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class FlakyCollectorHandler(CollectorHandler):
+    """
+    压测用：按 server.fault_rate 随机制造故障，两种各占一半：
+    lost    —— 请求未处理就返回 503，推送端须重发；
+    unacked —— 请求已处理但响应丢失（直接断开连接），推送端重发后收集端须按 seq 去重。
+    """
+
+    def do_POST(self):
+        server = self.server
+        with server.fault_lock:
+            roll = server.fault_rng.random()
+            fault = None
+            if roll < server.fault_rate / 2:
+                fault = "lost"
+            elif roll < server.fault_rate:
+                fault = "unacked"
+            if fault:
+                server.faults[fault] += 1
+
+        if fault == "lost":
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_error(503)
+            return
+        if fault == "unacked":
+            self.wfile = io.BytesIO()   # 响应写到别处，客户端只会看到连接被关闭
+            self.close_connection = True
+        super().do_POST()
+
+
+class ReplayReporter(FleetReporter):
+    """压测用：记住最后一个已确认送达的批次，用来重放验证去重"""
+
+    last_body = None
+
+    def _send(self, body):
+        super()._send(body)
+        self.last_body = body
+
+
+def run_loadtest(agents=300, rounds=48, sites=8, workers=16, seed=1, fault_rate=0.05, replay_rate=0.02):
+    """
+    在本机启动收集端，用 FleetReporter 模拟 agents 台机器，每轮相当于一次 30 分钟的检测。
+    收集端按 fault_rate 随机丢请求或丢响应，每轮另有 replay_rate 的机器重放已确认的批次。
+    结束后核对收集端统计与模拟端期望值完全一致，且重复批次数 = 丢失的响应数 + 重放数。
+    """
+    rng = random.Random(seed)
+    tracemalloc.start()
+    server = make_server("127.0.0.1", 0, handler=FlakyCollectorHandler)
+    server.fault_rate = fault_rate
+    server.fault_rng = random.Random(seed + 1)
+    server.fault_lock = threading.Lock()
+    server.faults = {"lost": 0, "unacked": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/report"
+
+    clocks = [SimClock(0.0) for _ in range(agents)]
+    reporters = [
+        ReplayReporter(url, agent_id=f"agent-{i:04d}", site=f"site-{i % sites}", clock=clocks[i])
+        for i in range(agents)
+    ]
+    connected = [True] * agents
+    expected = {"outages": 0, **dict.fromkeys(METRIC_KEYS, 0)}
+    failed = 0
+    replays = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for r in range(rounds):
+            for i, rep in enumerate(reporters):
+                clocks[i].t = r * 1800.0
+                if connected[i] and rng.random() < 0.95:
+                    rep.record_check(True)
+                    expected["checks"] += 1
+                    continue
+                rep.record_check(False)
+                clocks[i].t += 10.0
+                ok = rng.random() < 0.7
+                rep.record_reconnect(ok)
+                expected["checks"] += 1
+                expected["reconnects"] += 1
+                expected["reconnect_ok" if ok else "reconnect_fail"] += 1
+                if ok:
+                    expected["outages"] += 1
+                connected[i] = ok
+            failed += sum(1 for ok in pool.map(lambda rep: rep.flush(), reporters) if not ok)
+
+            # 重放已确认的批次；重放期间暂停故障注入，保证每次重放都确实到达收集端
+            rate, server.fault_rate = server.fault_rate, 0.0
+            for rep in reporters:
+                if rep._inflight is None and rep.last_body and rng.random() < replay_rate:
+                    rep._send(rep.last_body)
+                    replays += 1
+            server.fault_rate = rate
+
+        # 停止故障注入，把仍积压的批次全部重发
+        server.fault_rate = 0.0
+        pending = all(pool.map(lambda rep: rep.flush(), reporters))
+    elapsed = time.perf_counter() - start
+
+    summary = server.store.site_summary()
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, __file__)])
+    store_bytes = sum(stat.size for stat in snapshot.statistics("filename"))
+    tracemalloc.stop()
+    server.shutdown()
+    server.server_close()
+
+    batches = sum(rep.sent_batches for rep in reporters)
+    sent_bytes = sum(rep.sent_bytes for rep in reporters)
+    got = {key: sum(s[key] for s in summary.values()) for key in expected}
+
+    print(f"模拟机器: {agents}  站点: {sites}  轮次: {rounds}  耗时: {elapsed:.2f}s")
+    print(f"批次: {batches}  ({batches / elapsed:.0f}/s)  发送失败（已重试）: {failed}  "
+          f"压缩后平均大小: {sent_bytes / max(batches, 1):.0f} B")
+    print(f"注入故障: 丢请求 {server.faults['lost']}  丢响应 {server.faults['unacked']}  "
+          f"重放: {replays}  收集端去重: {server.store.duplicates}")
+    print(f"收集端状态内存（按分配位置统计）: {store_bytes / 1024:.1f} KiB  "
+          f"（约 {store_bytes / agents:.0f} B/台）")
+    for key in expected:
+        print(f"  {key:<15} 期望 {expected[key]:>7}  收集端 {got[key]:>7}")
+
+    dedup_ok = server.store.duplicates == server.faults["unacked"] + replays
+    exercised = fault_rate == 0 or (failed > 0 and server.faults["unacked"] > 0)
+    ok = pending and got == expected and dedup_ok and exercised
+    print("✅ 压测通过" if ok else "❌ 收集端统计与期望不一致")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="智能联网 - 多机状态收集端")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="启动收集端")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    load = sub.add_parser("loadtest", help="本机压测")
+    load.add_argument("--agents", type=int, default=300)
+    load.add_argument("--rounds", type=int, default=48)
+    load.add_argument("--sites", type=int, default=8)
+    load.add_argument("--workers", type=int, default=16)
+    load.add_argument("--seed", type=int, default=1)
+    load.add_argument("--fault-rate", type=float, default=0.05, help="收集端随机丢请求/丢响应的比例")
+    load.add_argument("--replay-rate", type=float, default=0.02, help="每轮重放已确认批次的机器比例")
+
+    args = parser.parse_args(argv)
+    if args.command == "loadtest":
+        ok = run_loadtest(args.agents, args.rounds, args.sites, args.workers, args.seed,
+                          args.fault_rate, args.replay_rate)
+        return 0 if ok else 1
+
+    server = make_server(args.host, args.port)
+    log(f"收集端已启动: http://{args.host}:{args.port}  (POST /report, GET /sites)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("🛑 收集端关闭")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
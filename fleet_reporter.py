@@ -0,0 +1,188 @@
+# fleet_reporter.py
+# 可选功能：把本机的联网状态变化与指标增量批量压缩后推送到集中收集端（fleet_collector.py）
+
+import json
+import math
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+
+FLUSH_INTERVAL = 60         # 单位：秒，两次推送之间的最短间隔
+SEND_TIMEOUT = 5            # 单位：秒
+MAX_PENDING_EVENTS = 256    # 收集端不可达时最多缓存的状态事件数，超出后丢弃最旧的
+METRIC_KEYS = ("checks", "reconnects", "reconnect_ok", "reconnect_fail")
+
+
+def encode_batch(batch):
+    """把一个批次编码为紧凑 JSON 并用 zlib 压缩"""
+    raw = json.dumps(batch, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(raw)
+
+
+def decode_batch(body):
+    return json.loads(zlib.decompress(body).decode("utf-8"))
+
+
+class FleetReporter:
+    """
+    汇总本机状态并定期推送。
+
+    状态只在变化时记录为事件 [时间戳, 1=已连接/0=断开]，指标只发送上次推送以来的增量；
+    没有新数据时不发请求。发送失败的批次原样保留并在下次重试（同一 seq），
+    收集端按 (boot, seq) 去重，因此不会重复计数。
+    """
+
+    def __init__(self, url, agent_id=None, site="default", flush_interval=FLUSH_INTERVAL,
+                 clock=time.time, log=None):
+        self.url = url
+        self.agent_id = agent_id or socket.gethostname()
+        self.site = site
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.log = log or (lambda msg: None)
+        # 每次进程启动唯一，收集端据此识别重启后从 1 开始的 seq
+        self.boot = f"{os.getpid()}-{int(time.time())}"
+        self.sent_batches = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=MAX_PENDING_EVENTS)
+        self._metrics = dict.fromkeys(METRIC_KEYS, 0)
+        self._connected = None
+        self._seq = 0
+        self._inflight = None
+        self._stop = threading.Event()
+        self._pending = threading.Event()
+        self._thread = None
+
+    # ---------- 由守护进程调用 ----------
+
+    def record_check(self, connected):
+        with self._lock:
+            self._metrics["checks"] += 1
+            self._set_state(connected)
+        self._pending.set()
+
+    def record_reconnect(self, success):
+        with self._lock:
+            self._metrics["reconnects"] += 1
+            self._metrics["reconnect_ok" if success else "reconnect_fail"] += 1
+            self._set_state(success)
+        self._pending.set()
+
+    def _set_state(self, connected):
+        connected = bool(connected)
+        if connected != self._connected:
+            self._connected = connected
+            self._events.append((round(self.clock(), 3), 1 if connected else 0))
+
+    # ---------- 批次与发送 ----------
+
+    def _take_batch(self):
+        with self._lock:
+            if not self._events and not any(self._metrics.values()):
+                return None
+            self._seq += 1
+            batch = {
+                "agent": self.agent_id,
+                "site": self.site,
+                "boot": self.boot,
+                "seq": self._seq,
+                "events": list(self._events),
+                "metrics": {k: v for k, v in self._metrics.items() if v},
+            }
+            self._events.clear()
+            self._metrics = dict.fromkeys(METRIC_KEYS, 0)
+            return batch
+
+    def _send(self, body):
+        # 用到时才导入：urllib.request 会连带载入 http.client 和 ssl，未配置收集端时不应常驻内存
+        import urllib.request
+
+        req = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "deflate"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=SEND_TIMEOUT) as resp:
+            resp.read()
+
+    def flush(self):
+        """
+        先重发上次失败的批次，再推送积压的新数据，直到全部送达。
+        全部送达（或无数据）时返回 True；失败时保留该批次待下次重试并返回 False。
+        """
+        import http.client
+
+        while True:
+            batch = self._inflight or self._take_batch()
+            if batch is None:
+                return True
+            # 先记为待确认再发送：无论发送时出什么异常，批次都不会丢失
+            self._inflight = batch
+            body = encode_batch(batch)
+            try:
+                self._send(body)
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                self.log(f"⚠️ 推送状态到收集端失败: {e!r}")
+                return False
+            self._inflight = None
+            self.sent_batches += 1
+            self.sent_bytes += len(body)
+
+    def _run(self):
+        # 没有新数据时线程一直阻塞，不做周期性唤醒；有数据后再等 flush_interval 攒成一批
+        while True:
+            self._pending.wait()
+            if self._stop.wait(self.flush_interval):
+                return
+            self._pending.clear()
+            try:
+                ok = self.flush()
+            except Exception as e:
+                # 推送线程不能退出，否则之后的状态再也不会推送
+                self.log(f"⚠️ 推送线程异常: {e!r}")
+                ok = False
+            if not ok:
+                self._pending.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pending.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SEND_TIMEOUT)
+        self.flush()
+
+
+def create_reporter(settings, log=None):
+    """根据 user_settings.json 创建推送器；未配置 fleet_collector 时返回 None"""
+    url = settings.get("fleet_collector")
+    if not url:
+        return None
+
+    # 配置文件里的值可能是字符串（如 "60"），无效时回退到默认间隔
+    flush_interval = settings.get("fleet_flush_interval", FLUSH_INTERVAL)
+    try:
+        flush_interval = float(flush_interval)
+    except (TypeError, ValueError):
+        flush_interval = None
+    if flush_interval is None or not math.isfinite(flush_interval) or flush_interval < 0:
+        if log:
+            log(f"⚠️ fleet_flush_interval 配置无效，使用默认值 {FLUSH_INTERVAL} 秒")
+        flush_interval = FLUSH_INTERVAL
+
+    return FleetReporter(
+        url,
+        agent_id=settings.get("fleet_agent_id"),
+        site=settings.get("fleet_site", "default"),
+        flush_interval=flush_interval,
+        log=log,
+    )
@@ -0,0 +1,319 @@
+# footprint.py
+# 常驻守护进程的占用测量：RSS、tracemalloc 快照、检测（唤醒）频率，以及模拟一周运行的浸泡测试
+#
+# 用法：
+#   python footprint.py soak [--days 7] [--interval 60]
+
+import ctypes
+import gc
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+DEFAULT_BUDGET_MB = 40      # 常驻内存预算，单位：MB
+SOAK_MAX_OWN_KB = 8         # 浸泡测试中本项目代码分配的对象允许增长，单位：KB
+# 整个进程允许的增长，单位：KB。urllib 每次请求拼出的属性名会留在解释器的
+# 类型属性缓存里（上限 4096 项），预热后仍会缓慢填充，但有上限，不算泄漏
+SOAK_MAX_GROWTH_KB = 256
+SOAK_MAX_RSS_GROWTH_KB = 1024   # 浸泡测试允许的 RSS 增长，单位：KB
+MB = 1024 * 1024
+
+if sys.platform == "win32":
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _kernel32 = ctypes.windll.kernel32
+    _kernel32.GetCurrentProcess.argtypes = []
+    _kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    # 必须声明参数类型：否则伪句柄 -1 会按 32 位 long 传参而抛出 ArgumentError
+    _kernel32.K32GetProcessMemoryInfo.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD
+    ]
+    _kernel32.K32GetProcessMemoryInfo.restype = wintypes.BOOL
+    _memory_counters = PROCESS_MEMORY_COUNTERS()
+    _memory_counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+
+
+def rss_bytes():
+    """当前进程的常驻内存（Windows 下为工作集），取不到时返回 0"""
+    if sys.platform == "win32":
+        try:
+            ok = _kernel32.K32GetProcessMemoryInfo(
+                _kernel32.GetCurrentProcess(), ctypes.byref(_memory_counters), _memory_counters.cb
+            )
+        except (OSError, ctypes.ArgumentError, AttributeError):
+            return 0
+        return _memory_counters.WorkingSetSize if ok else 0
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Footprint:
+    """运行期的占用统计；trace=True 时开启 tracemalloc（本身约增加一倍的 Python 堆开销）"""
+    __slots__ = ("budget", "started", "over_budget")
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, trace=False, log=None):
+        # 配置文件里的值可能是字符串（如 "40"），无效时回退到默认预算
+        try:
+            budget_mb = float(budget_mb)
+        except (TypeError, ValueError):
+            budget_mb = None
+        if budget_mb is None or not math.isfinite(budget_mb) or budget_mb <= 0:
+            if log:
+                log(f"⚠️ footprint_budget_mb 配置无效，使用默认值 {DEFAULT_BUDGET_MB} MB")
+            budget_mb = DEFAULT_BUDGET_MB
+        self.budget = int(budget_mb * MB)
+        self.started = time.monotonic()
+        self.over_budget = False
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def check_budget(self):
+        """RSS 刚超出预算时返回 True；持续超出只报告一次，回落后重新计"""
+        over = rss_bytes() > self.budget
+        first = over and not self.over_budget
+        self.over_budget = over
+        return first
+
+    def snapshot(self, state=None):
+        uptime = time.monotonic() - self.started
+        info = {
+            "rss_mb": round(rss_bytes() / MB, 1),
+            "budget_mb": round(self.budget / MB, 1),
+            "uptime_h": round(uptime / 3600, 2),
+            "gc_objects": len(gc.get_objects()),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            info["traced_mb"] = round(current / MB, 2)
+            info["traced_peak_mb"] = round(peak / MB, 2)
+        if state is not None:
+            info["checks"] = state.checks
+            info["wakeups_per_h"] = round(state.checks / max(uptime / 3600, 1 / 60), 2)  # 至少按 1 分钟算，避免刚启动时失真
+        return info
+
+    def top_allocations(self, limit=10):
+        if not tracemalloc.is_tracing():
+            return []
+        stats = tracemalloc.take_snapshot().statistics("lineno")
+        return [str(stat) for stat in stats[:limit]]
+
+
+def format_snapshot(info):
+    parts = [f"内存 {info['rss_mb']} MB / 预算 {info['budget_mb']} MB"]
+    if "traced_mb" in info:
+        parts.append(f"Python 堆 {info['traced_mb']} MB（峰值 {info['traced_peak_mb']} MB）")
+    if "checks" in info:
+        parts.append(f"检测 {info['checks']} 次，{info['wakeups_per_h']} 次/小时")
+    parts.append(f"运行 {info['uptime_h']} 小时")
+    return "，".join(parts)
+
+
+# ========== 浸泡测试：模拟一周的常驻检测，确认内存不增长 ==========
+
+class _SoakDone(Exception):
+    pass
+
+
+def _soak_pass(days, interval, seed, trace):
+    """
+    按常驻守护进程的实际配置跑一遍 backend.monitor_network：节能模式（gc.freeze）、每次检测后的
+    预算检查、FleetReporter 自己的推送线程，并尽量载入托盘图标与通知模块。网络状态是模拟的，
+    sleep 被替换为推进模拟时钟。收集端在子进程里，本进程只有守护进程这一侧。
+    trace=True 时开启 tracemalloc 比较 Python 堆；它本身会明显抬高 RSS，所以 RSS 只在 trace=False 时有意义。
+    """
+    import json
+    import random
+    import socket
+    import subprocess
+    import urllib.request
+
+    import backend
+    from fleet_collector import SimClock
+    from fleet_reporter import FleetReporter
+
+    rng = random.Random(seed)
+    link = [True]
+    budget_alerts = [0]
+
+    def fake_check(target_ssid):
+        if rng.random() < 0.01:
+            link[0] = False
+        return link[0]
+
+    def fake_connect(ssid, password):
+        link[0] = rng.random() < 0.8
+        return link[0]
+
+    def fake_notify(title, message):
+        if title == "内存占用超出预算":
+            budget_alerts[0] += 1
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    collector_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fleet_collector.py")
+    collector = subprocess.Popen([sys.executable, collector_script, "serve", "--host", "127.0.0.1",
+                                  "--port", str(port)], stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url + "/sites", timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        if trace:
+            tracemalloc.start()
+        clock = SimClock(0.0)
+        # 推送线程按真实时间攒批，间隔取很短，让它在模拟的一周里也会反复唤醒和推送
+        reporter = FleetReporter(base_url + "/report", agent_id=f"soak-{trace}", clock=clock,
+                                 flush_interval=0.005).start()
+        state = backend.MonitorState("SoakNet", "00000000", quiet=True)
+        footprint = Footprint()
+        backend.LOG_ENABLED = False
+
+        loaded = []
+        try:
+            tray = backend.build_tray_icon(state, footprint, reporter)
+            tray.icon.load()
+            loaded.append("PIL/pystray")
+        except Exception as e:
+            print(f"⚠️ 未能载入托盘图标（{e!r}），RSS 不含 PIL/pystray")
+        try:
+            from plyer import notification  # noqa: F401
+            loaded.append("plyer")
+        except ImportError:
+            print("⚠️ 未安装 plyer，RSS 不含通知模块")
+
+        total = int(days * 86400 / interval)
+        warmup = max(total // 20, 100)
+        result = {"loaded": loaded, "state": state, "budget": footprint.budget}
+
+        def fake_sleep(seconds):
+            clock.t += seconds
+            if state.checks == warmup:
+                gc.collect()
+                result["base_rss"] = rss_bytes()
+                if trace:
+                    result["baseline"] = tracemalloc.take_snapshot()
+            if state.checks >= total:
+                raise _SoakDone
+
+        start = time.perf_counter()
+        try:
+            backend.monitor_network("SoakNet", "00000000", check_interval=interval, reporter=reporter,
+                                    state=state, footprint=footprint, check=fake_check,
+                                    connect=fake_connect, notify=fake_notify, sleep=fake_sleep)
+        except _SoakDone:
+            pass
+        reporter.stop()
+        result["elapsed"] = time.perf_counter() - start
+        result["batches"] = reporter.sent_batches
+        result["budget_alerts"] = budget_alerts[0]
+
+        gc.collect()
+        result["rss"] = rss_bytes()
+        if trace:
+            result["final"] = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        site = json.loads(urllib.request.urlopen(base_url + "/sites", timeout=5).read())["default"]
+        result["received"] = site
+    finally:
+        collector.terminate()
+        collector.wait()
+    return result
+
+
+def run_soak(days=7, interval=60, seed=1, max_growth_kb=SOAK_MAX_GROWTH_KB, max_own_kb=SOAK_MAX_OWN_KB,
+             max_rss_growth_kb=SOAK_MAX_RSS_GROWTH_KB):
+    """
+    模拟 days 天、每 interval 秒一次检测的常驻运行，跑两遍同样的一周：
+    第一遍不开 tracemalloc，检查 RSS 不增长且不超出预算；第二遍开 tracemalloc，检查 Python 堆不增长。
+    两遍都核对收集端收到的计数与实际检测一致。
+    """
+    if sys.platform != "win32" and not os.environ.get("DISPLAY"):
+        # 无图形环境时让 pystray 使用 dummy 后端，托盘相关的模块和图标仍会载入
+        os.environ.setdefault("PYSTRAY_BACKEND", "dummy")
+
+    plain = _soak_pass(days, interval, seed, trace=False)
+    traced = _soak_pass(days, interval, seed, trace=True)
+
+    state = plain["state"]
+    diff = traced["final"].compare_to(traced["baseline"], "filename")
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    growth = sum(stat.size_diff for stat in diff)
+    own_growth = sum(stat.size_diff for stat in diff
+                     if stat.traceback[0].filename.startswith(project_dir))
+    rss_growth = plain["rss"] - plain["base_rss"]
+
+    print(f"模拟 {days} 天，每 {interval} 秒检测一次：共 {state.checks} 次检测，{state.reconnects} 次重连，"
+          f"耗时 {plain['elapsed']:.1f}s + {traced['elapsed']:.1f}s")
+    delivered = True
+    for name, result in (("RSS 测量", plain), ("堆测量", traced)):
+        got = result["received"]
+        st = result["state"]
+        print(f"{name}: 推送批次 {result['batches']}，收集端收到检测 {got['checks']} 次、重连 {got['reconnects']} 次，"
+              f"记录断网 {got['outages']} 次")
+        delivered = delivered and got["checks"] == st.checks and got["reconnects"] == st.reconnects
+    print(f"已载入: {', '.join(plain['loaded']) or '无'}  超预算提醒: {plain['budget_alerts']} 次")
+    print(f"预热后 Python 堆增长: 本项目 {own_growth / 1024:.1f} KB（上限 {max_own_kb} KB），"
+          f"全部 {growth / 1024:.1f} KB（上限 {max_growth_kb} KB）")
+    print(f"RSS: 预热后 {plain['base_rss'] / MB:.1f} MB → 结束 {plain['rss'] / MB:.1f} MB"
+          f"（增长上限 {max_rss_growth_kb} KB，预算 {plain['budget'] / MB:.0f} MB）")
+
+    grew = (own_growth > max_own_kb * 1024 or growth > max_growth_kb * 1024
+            or rss_growth > max_rss_growth_kb * 1024)
+    within_budget = plain["rss"] <= plain["budget"] and plain["budget_alerts"] == 0
+    ok = not grew and delivered and within_budget
+    if grew:
+        for stat in traced["final"].compare_to(traced["baseline"], "lineno")[:10]:
+            print(f"    {stat}")
+    if not delivered:
+        print("❌ 收集端收到的计数与实际检测不一致")
+    print("✅ 无内存增长" if ok else "❌ 超出占用预算")
+    return ok
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="智能联网 - 守护进程占用测量")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    soak = sub.add_parser("soak", help="模拟一周运行的浸泡测试")
+    soak.add_argument("--days", type=float, default=7)
+    soak.add_argument("--interval", type=float, default=60, help="模拟的检测间隔，单位：秒")
+    soak.add_argument("--seed", type=int, default=1)
+    soak.add_argument("--max-growth-kb", type=int, default=SOAK_MAX_GROWTH_KB)
+    soak.add_argument("--max-own-kb", type=int, default=SOAK_MAX_OWN_KB)
+    soak.add_argument("--max-rss-growth-kb", type=int, default=SOAK_MAX_RSS_GROWTH_KB)
+
+    args = parser.parse_args(argv)
+    ok = run_soak(args.days, args.interval, args.seed, args.max_growth_kb, args.max_own_kb,
+                  args.max_rss_growth_kb)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
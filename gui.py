@@ -318,8 +318,9 @@ def setup_monitor_choice_frame(root_window, profiles, default_combo):
         else:
             pass  # 可选：添加停止监控逻辑
 
-        # 无论是否成功，都保存设置
-        save_settings({"monitor_enabled": choice})
+        # 无论是否成功，都保存设置（保留 fleet_collector 等其他配置项）
+        settings["monitor_enabled"] = choice
+        save_settings(settings)
 
     monitor_label = tk.Label(root_window, text="启用网络监护模式（仅作用于默认网络）", font=("微软雅黑", 10))
     monitor_label.pack(pady=(10, 0))
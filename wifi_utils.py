@@ -8,6 +8,7 @@ import datetime
 import time
 
 PROFILE_PATH = os.path.join(os.getcwd(), "{}.xml")
+SHOW_INTERFACES_CMD = ("netsh", "wlan", "show", "interfaces")
 
 def sanitize_ssid(ssid):
     """清理SSID中可能导致文件名错误的字符"""
@@ -19,7 +20,7 @@ def log(msg):
 
 def is_connected(target_ssid):
     try:
-        output = subprocess.check_output(["netsh", "wlan", "show", "interfaces"], stderr=subprocess.STDOUT)
+        output = subprocess.check_output(SHOW_INTERFACES_CMD, stderr=subprocess.STDOUT)
         for encoding in ('utf-8', 'gbk'):
             try:
                 output_str = output.decode(encoding)